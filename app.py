@@ -8,6 +8,9 @@ print("Starting app.py import...")
 import os
 import json
 import time
+import queue
+import atexit
+import itertools
 import sqlite3
 from dotenv import load_dotenv
 
@@ -15,14 +18,16 @@ from dotenv import load_dotenv
 load_dotenv()
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 import threading
 import logging
 
-from flask import Flask, request, jsonify, render_template, g
+from flask import Flask, Response, request, jsonify, render_template, g
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import humanize
+import orjson
 
 print("All imports completed, configuring logging...")
 
@@ -40,47 +45,101 @@ BigtableDB = None  # Will be imported lazily
 if USE_BIGTABLE:
     logger.info("Bigtable mode enabled - will connect when first needed")
 
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson
+    
+    Also passed to SocketIO as its json module, which calls dumps/loads
+    with stdlib keyword arguments that orjson doesn't need.
+    """
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 # Initialize Flask app
 logger.info("Initializing Flask app...")
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 logger.info("Configuring CORS...")
 CORS(app)
 logger.info("Initializing SocketIO...")
-socketio = SocketIO(app, cors_allowed_origins="*")
+# start.py runs gthread workers and selects 'threading'; unset auto-detects
+socketio = SocketIO(app, cors_allowed_origins="*", json=app.json,
+                    async_mode=os.environ.get('SOCKETIO_ASYNC_MODE'))
 logger.info("Flask app initialized successfully")
 
 # Database configuration
 DATABASE = os.environ.get('DATABASE_PATH', 'hashrate.db')
 CLEANUP_INTERVAL = 3600  # Clean old records every hour
 RETENTION_DAYS = 7  # Keep data for 7 days
+CLEANUP_BATCH_SIZE = 10000  # Rows deleted per cleanup transaction
+CLEANUP_BATCH_PAUSE = 0.1  # Seconds to yield to the writer between batches
+
+# Column order matches HistoryWriter rows built in receive_hashrate
+INSERT_HISTORY_SQL = '''
+    INSERT INTO hashrate_history 
+    (instance_id, total_hashes, overall_hashrate, recent_hashrate, 
+     gpu_count, gpu_available, ip_address, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# WAL lets readers run alongside the writer; NORMAL sync is safe under WAL
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+)
+
+
+def sqlite_timestamp(dt: datetime) -> str:
+    """Format a cutoff the way sqlite3's datetime adapter would, skipping the adapter"""
+    return dt.isoformat(' ')
+
+
+def configure_connection(db):
+    """Apply performance PRAGMAs to a new SQLite connection"""
+    for pragma in SQLITE_PRAGMAS:
+        db.execute(pragma)
+    return db
 
 # Initialize Bigtable lazily to avoid startup timeout
 bigtable_db = None
+# Concurrent first requests must not each build a BigtableDB (and its threads)
+bigtable_db_lock = threading.Lock()
 
 def get_bigtable_db():
     """Get or create Bigtable connection lazily"""
     global bigtable_db, BigtableDB
     if USE_BIGTABLE and bigtable_db is None:
-        try:
-            # Import BigtableDB only when first needed
-            if BigtableDB is None:
-                logger.info("Importing BigtableDB module...")
-                from bigtable_db import BigtableDB as BigtableDBClass
-                BigtableDB = BigtableDBClass
-                logger.info("BigtableDB module imported successfully")
-            
-            logger.info("Initializing Bigtable connection...")
-            bigtable_db = BigtableDB()
-            logger.info("Bigtable connection initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize Bigtable: {e}")
-            # Fall back to SQLite if Bigtable fails
-            return None
+        with bigtable_db_lock:
+            # Another request may have connected while this one waited
+            if bigtable_db is not None:
+                return bigtable_db
+            try:
+                # Import BigtableDB only when first needed
+                if BigtableDB is None:
+                    logger.info("Importing BigtableDB module...")
+                    from bigtable_db import BigtableDB as BigtableDBClass
+                    BigtableDB = BigtableDBClass
+                    logger.info("BigtableDB module imported successfully")
+                
+                logger.info("Initializing Bigtable connection...")
+                bigtable_db = BigtableDB()
+                logger.info("Bigtable connection initialized successfully")
+            except Exception as e:
+                logger.error(f"Failed to initialize Bigtable: {e}")
+                # Fall back to SQLite if Bigtable fails
+                return None
     return bigtable_db
 
 
-@dataclass
+@dataclass(slots=True)
 class HashrateData:
     """Data structure for hashrate information"""
     instance_id: str
@@ -92,79 +151,329 @@ class HashrateData:
     gpu_available: bool
     ip_address: str = ""
     last_seen: float = 0
+    
+    def to_dict(self) -> dict:
+        """Flat dict of all fields (cheaper than dataclasses.asdict)"""
+        return {
+            'instance_id': self.instance_id,
+            'total_hashes': self.total_hashes,
+            'overall_hashrate': self.overall_hashrate,
+            'recent_hashrate': self.recent_hashrate,
+            'timestamp': self.timestamp,
+            'gpu_count': self.gpu_count,
+            'gpu_available': self.gpu_available,
+            'ip_address': self.ip_address,
+            'last_seen': self.last_seen
+        }
 
 
-class HashrateStore:
-    """In-memory store for active instances"""
+class _StoreShard:
+    """One shard of HashrateStore: a copy-on-write dict plus its running sums"""
+    
+    __slots__ = ('lock', 'snapshot', 'sum_recent', 'sum_total', 'sum_gpus', 'totals')
     
     def __init__(self):
-        self.instances: Dict[str, HashrateData] = {}
         self.lock = threading.Lock()
+        self.snapshot: Dict[str, HashrateData] = {}
+        self.sum_recent = 0.0
+        self.sum_total = 0
+        self.sum_gpus = 0
+        self.totals = (0, 0.0, 0, 0)  # (instances, recent, total_hashes, gpus)
+
+
+class HashrateStore:
+    """In-memory store for active instances
     
-    def update(self, data: HashrateData):
-        """Update instance data"""
-        with self.lock:
-            data.last_seen = time.time()
-            self.instances[data.instance_id] = data
+    Instances are spread over SHARD_COUNT shards by instance_id, each with
+    its own writer lock, so concurrent reports from different generators
+    rarely contend. Writers copy their shard's dict and swap it in, so
+    readers use the current snapshots without locking. Aggregate sums are
+    kept up to date by update() and published alongside each snapshot; a
+    background sweeper evicts instances that stopped reporting.
+    """
+    
+    STATS_TTL = 0.5  # Seconds to reuse computed stats while nothing changes
+    INSTANCE_TIMEOUT = 30  # Seconds before an instance is considered gone
+    SWEEP_INTERVAL = 5  # Seconds between stale-instance sweeps
+    SHARD_COUNT = 16  # Must be a power of two
+    
+    def __init__(self):
+        self._shards = [_StoreShard() for _ in range(self.SHARD_COUNT)]
+        self._version_counter = itertools.count(1)
+        self._version = 0
+        self._stats_cache = (0.0, -1, None)  # (computed_at, version, stats)
+        self._stats_json = (None, b'')  # (stats, serialized stats)
+        self._instances_json = (-1, b'')  # (version, serialized instances)
+        
+        # Start sweeper thread
+        self.sweeper_thread = threading.Thread(target=self._sweep_loop, daemon=True)
+        self.sweeper_thread.start()
+    
+    def _shard_for(self, instance_id: str) -> _StoreShard:
+        return self._shards[hash(instance_id) & (self.SHARD_COUNT - 1)]
+    
+    def update(self, data: HashrateData) -> bool:
+        """Update instance data, returning False if the sample repeats the last one"""
+        data.last_seen = time.time()
+        shard = self._shard_for(data.instance_id)
+        with shard.lock:
+            old = shard.snapshot.get(data.instance_id)
+            changed = (
+                old is None
+                or old.total_hashes != data.total_hashes
+                or old.recent_hashrate != data.recent_hashrate
+            )
+            # New sums are computed before anything is stored, so a sample
+            # that fails arithmetic leaves the shard untouched
+            sum_recent = shard.sum_recent + data.recent_hashrate
+            sum_total = shard.sum_total + data.total_hashes
+            sum_gpus = shard.sum_gpus + (data.gpu_count if data.gpu_available else 0)
+            if old is not None:
+                sum_recent -= old.recent_hashrate
+                sum_total -= old.total_hashes
+                sum_gpus -= old.gpu_count if old.gpu_available else 0
+            
+            shard.sum_recent, shard.sum_total, shard.sum_gpus = sum_recent, sum_total, sum_gpus
+            shard.snapshot = {**shard.snapshot, data.instance_id: data}
+            self._publish_totals(shard)
+        return changed
+    
+    def evict_stale(self):
+        """Drop instances not seen within INSTANCE_TIMEOUT"""
+        cutoff = time.time() - self.INSTANCE_TIMEOUT
+        for shard in self._shards:
+            if all(inst.last_seen > cutoff for inst in shard.snapshot.values()):
+                continue
+            
+            with shard.lock:
+                live = {
+                    instance_id: inst for instance_id, inst in shard.snapshot.items()
+                    if inst.last_seen > cutoff
+                }
+                # Recompute from scratch so float drift doesn't accumulate
+                shard.sum_recent = sum(inst.recent_hashrate for inst in live.values())
+                shard.sum_total = sum(inst.total_hashes for inst in live.values())
+                shard.sum_gpus = sum(inst.gpu_count for inst in live.values() if inst.gpu_available)
+                
+                shard.snapshot = live
+                self._publish_totals(shard)
+    
+    def _sweep_loop(self):
+        """Periodically evict stale instances off the request path"""
+        while True:
+            time.sleep(self.SWEEP_INTERVAL)
+            try:
+                self.evict_stale()
+            except Exception as e:
+                logger.error(f"Instance sweeper error: {e}")
+    
+    def _publish_totals(self, shard: _StoreShard):
+        """Publish a shard's running sums and bump the version (caller holds shard.lock)"""
+        shard.totals = (len(shard.snapshot), shard.sum_recent, shard.sum_total, shard.sum_gpus)
+        self._version = next(self._version_counter)
     
     def get_all(self) -> List[HashrateData]:
         """Get all active instances"""
-        with self.lock:
-            # Filter out instances not seen in last 30 seconds
-            cutoff = time.time() - 30
-            active = [
-                inst for inst in self.instances.values()
-                if inst.last_seen > cutoff
-            ]
-            return active
+        instances = []
+        for shard in self._shards:
+            instances.extend(shard.snapshot.values())
+        return instances
     
     def get_stats(self) -> dict:
         """Get aggregate statistics"""
-        instances = self.get_all()
-        
-        if not instances:
-            return {
-                'total_instances': 0,
-                'total_hashrate': 0,
-                'total_hashes': 0,
-                'total_gpus': 0,
-                'avg_hashrate': 0
-            }
+        computed_at, version, stats = self._stats_cache
+        now = time.monotonic()
+        if version == self._version and now - computed_at < self.STATS_TTL:
+            return stats
         
-        total_hashrate = sum(inst.recent_hashrate for inst in instances)
-        total_hashes = sum(inst.total_hashes for inst in instances)
-        total_gpus = sum(inst.gpu_count for inst in instances if inst.gpu_available)
-        
-        return {
-            'total_instances': len(instances),
+        version = self._version
+        count = total_hashes = total_gpus = 0
+        total_hashrate = 0.0
+        for shard in self._shards:
+            shard_count, shard_recent, shard_total, shard_gpus = shard.totals
+            count += shard_count
+            total_hashrate += shard_recent
+            total_hashes += shard_total
+            total_gpus += shard_gpus
+        stats = {
+            'total_instances': count,
             'total_hashrate': total_hashrate,
             'total_hashes': total_hashes,
             'total_gpus': total_gpus,
-            'avg_hashrate': total_hashrate / len(instances) if instances else 0
+            'avg_hashrate': total_hashrate / count if count else 0
         }
+        self._stats_cache = (now, version, stats)
+        return stats
+    
+    def get_stats_json(self) -> bytes:
+        """Aggregate statistics as JSON, serialized once per computed stats dict"""
+        stats = self.get_stats()
+        cached_stats, body = self._stats_json
+        if cached_stats is not stats:
+            body = orjson.dumps(stats)
+            self._stats_json = (stats, body)
+        return body
+    
+    def get_instances_json(self) -> bytes:
+        """Active instances as JSON, serialized once per store version"""
+        version, body = self._instances_json
+        if version != self._version:
+            version = self._version
+            body = orjson.dumps([inst.to_dict() for inst in self.get_all()])
+            self._instances_json = (version, body)
+        return body
+
+
+class HistoryWriter:
+    """Background thread that batches hashrate rows into SQLite
+    
+    A batch is written once it holds batch_size rows or flush_interval
+    seconds after its first row arrived.
+    """
+    
+    def __init__(self, database: str, batch_size: int = 500, flush_interval: float = 1.0):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.closing = False
+        
+        # Start writer thread
+        self.thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.thread.start()
+        # Accepted rows still queued at shutdown are written, not dropped
+        atexit.register(self.close)
+    
+    def enqueue(self, row: tuple):
+        """Queue a row for the next batch"""
+        self.queue.put(row)
+    
+    def close(self, timeout: float = 10.0):
+        """Write every queued row and stop the writer thread"""
+        self.queue.put(None)
+        self.thread.join(timeout)
+    
+    def _next_batch(self) -> List[tuple]:
+        """Block for one row, then collect more until the batch is full or the window closes"""
+        rows = [self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.batch_size and rows[-1] is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # close() queues None: write this batch at once, then stop
+        if rows[-1] is None:
+            self.closing = True
+            rows.pop()
+        return rows
+    
+    def _writer_loop(self):
+        """Drain the queue batch by batch on a dedicated connection"""
+        self.conn = configure_connection(
+            sqlite3.connect(self.database, check_same_thread=False, isolation_level=None)
+        )
+        # One long-lived cursor keeps the prepared INSERT statement warm
+        self.cur = self.conn.cursor()
+        while not self.closing:
+            rows = self._next_batch()
+            if not rows:
+                continue
+            try:
+                self.write_batch(rows)
+            except Exception as e:
+                logger.error(f"Error writing {len(rows)} hashrate rows: {e}")
+    
+    def write_batch(self, rows: List[tuple]):
+        """Insert one batch in a single transaction"""
+        try:
+            self.cur.execute('BEGIN IMMEDIATE')
+            self.cur.executemany(INSERT_HISTORY_SQL, rows)
+            self.cur.execute('COMMIT')
+        except Exception:
+            if self.conn.in_transaction:
+                self.cur.execute('ROLLBACK')
+            raise
+
+
+class UpdateBroadcaster:
+    """Coalesces per-instance updates into one WebSocket message per interval"""
+    
+    def __init__(self, store: HashrateStore, interval: float = 0.1):
+        self.store = store
+        self.interval = interval
+        self.pending: Dict[str, HashrateData] = {}
+        self.lock = threading.Lock()
+        self.started = False
+    
+    def publish(self, data: HashrateData):
+        """Record the latest sample for an instance, replacing any unsent one"""
+        with self.lock:
+            self.pending[data.instance_id] = data
+            if not self.started:
+                # Started lazily so the task runs under the server's async mode
+                self.started = True
+                socketio.start_background_task(self._broadcast_loop)
+    
+    def _broadcast_loop(self):
+        """Emit accumulated updates every interval"""
+        while True:
+            socketio.sleep(self.interval)
+            with self.lock:
+                if not self.pending:
+                    continue
+                batch, self.pending = self.pending, {}
+            try:
+                socketio.emit('hashrate_batch', {
+                    'instances': [inst.to_dict() for inst in batch.values()],
+                    'stats': self.store.get_stats()
+                }, namespace='/')
+            except Exception as e:
+                logger.warning(f"Failed to emit WebSocket update: {e}")
 
 
 # Global hashrate store
 logger.info("Creating HashrateStore instance...")
 hashrate_store = HashrateStore()
 logger.info("HashrateStore created successfully")
+update_broadcaster = UpdateBroadcaster(hashrate_store)
+
+# Batched SQLite writer (BigtableDB buffers its own writes)
+history_writer = None if USE_BIGTABLE else HistoryWriter(DATABASE)
+
+
+# Idle SQLite connections reused across requests
+DB_POOL_SIZE = 8
+db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
 
 
 def get_db():
     """Get database connection"""
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        try:
+            db = db_pool.get_nowait()
+        except queue.Empty:
+            db = configure_connection(sqlite3.connect(DATABASE, check_same_thread=False))
+            db.row_factory = sqlite3.Row
+        g._database = db
     return db
 
 
 @app.teardown_appcontext
 def close_connection(exception):
-    """Close database connection"""
-    db = getattr(g, '_database', None)
+    """Return database connection to the pool"""
+    db = g.pop('_database', None)
     if db is not None:
-        db.close()
+        # Don't hand an open transaction to the next request
+        db.rollback()
+        try:
+            db_pool.put_nowait(db)
+        except queue.Full:
+            db.close()
 
 
 def init_db():
@@ -190,10 +499,12 @@ def init_db():
                 )
             ''')
             
-            # Create index for faster queries
+            # Covering index so history queries never touch the table
+            db.execute('DROP INDEX IF EXISTS idx_instance_timestamp')
             db.execute('''
-                CREATE INDEX IF NOT EXISTS idx_instance_timestamp 
-                ON hashrate_history(instance_id, timestamp DESC)
+                CREATE INDEX IF NOT EXISTS idx_instance_timestamp_covering 
+                ON hashrate_history(instance_id, timestamp DESC,
+                                    recent_hashrate, total_hashes, gpu_count)
             ''')
             
             db.execute('''
@@ -222,16 +533,26 @@ def cleanup_old_records():
         with app.app_context():
             try:
                 db = get_db()
-                cutoff = datetime.now() - timedelta(days=RETENTION_DAYS)
+                cutoff = sqlite_timestamp(datetime.now() - timedelta(days=RETENTION_DAYS))
                 
-                result = db.execute(
-                    'DELETE FROM hashrate_history WHERE created_at < ?',
-                    (cutoff,)
-                )
-                db.commit()
+                # Delete in short transactions so ingestion isn't blocked
+                deleted = 0
+                while True:
+                    result = db.execute('''
+                        DELETE FROM hashrate_history WHERE rowid IN (
+                            SELECT rowid FROM hashrate_history
+                            WHERE created_at < ? LIMIT ?
+                        )
+                    ''', (cutoff, CLEANUP_BATCH_SIZE))
+                    db.commit()
+                    deleted += result.rowcount
+                    if result.rowcount < CLEANUP_BATCH_SIZE:
+                        break
+                    time.sleep(CLEANUP_BATCH_PAUSE)
                 
-                if result.rowcount > 0:
-                    logger.info(f"Cleaned up {result.rowcount} old records")
+                if deleted > 0:
+                    db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                    logger.info(f"Cleaned up {deleted} old records")
             except Exception as e:
                 logger.error(f"Error cleaning up old records: {e}")
 
@@ -254,19 +575,29 @@ def index():
         return render_template('dashboard.html')
 
 
+REQUIRED_FIELDS = frozenset({
+    'instance_id', 'total_hashes', 'overall_hashrate',
+    'recent_hashrate', 'timestamp', 'gpu_count', 'gpu_available'
+})
+NUMERIC_FIELDS = ('total_hashes', 'overall_hashrate', 'recent_hashrate', 'gpu_count')
+
+
 @app.route('/api/hashrate', methods=['POST'])
 def receive_hashrate():
     """Receive hashrate data from generator instances"""
     try:
-        data = request.json
+        data = orjson.loads(request.get_data())
         
         # Validate required fields
-        required_fields = ['instance_id', 'total_hashes', 'overall_hashrate', 
-                         'recent_hashrate', 'timestamp', 'gpu_count', 'gpu_available']
+        missing = REQUIRED_FIELDS.difference(data)
+        if missing:
+            return jsonify({'error': f'Missing field: {", ".join(sorted(missing))}'}), 400
         
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing field: {field}'}), 400
+        # Numeric fields feed the running sums in HashrateStore
+        invalid = [field for field in NUMERIC_FIELDS
+                   if not isinstance(data[field], (int, float)) or isinstance(data[field], bool)]
+        if invalid:
+            return jsonify({'error': f'Field must be a number: {", ".join(invalid)}'}), 400
         
         # Get client IP
         ip_address = request.headers.get('X-Forwarded-For', request.remote_addr)
@@ -284,9 +615,9 @@ def receive_hashrate():
         )
         
         # Update in-memory store
-        hashrate_store.update(hashrate_data)
+        changed = hashrate_store.update(hashrate_data)
         
-        # Store in database
+        # Store in database (buffered either way, so accepted samples get 202)
         if USE_BIGTABLE:
             # Prepare data for Bigtable
             bigtable_data = {
@@ -311,20 +642,15 @@ def receive_hashrate():
             if 'efficiency' in data:
                 bigtable_data['efficiency'] = data['efficiency']
             
+            # save_hashrate() only buffers; BigtableDB flushes in batches
             db = get_bigtable_db()
             if db:
-                if not db.save_hashrate(bigtable_data):
-                    raise Exception("Failed to save to Bigtable")
+                db.save_hashrate(bigtable_data)
             else:
                 raise Exception("Bigtable connection not available")
-        else:
-            db = get_db()
-            db.execute('''
-                INSERT INTO hashrate_history 
-                (instance_id, total_hashes, overall_hashrate, recent_hashrate, 
-                 gpu_count, gpu_available, ip_address, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+        elif changed:
+            # Identical repeat samples only refresh last_seen
+            history_writer.enqueue((
                 hashrate_data.instance_id,
                 hashrate_data.total_hashes,
                 hashrate_data.overall_hashrate,
@@ -334,20 +660,13 @@ def receive_hashrate():
                 hashrate_data.ip_address,
                 hashrate_data.timestamp
             ))
-            db.commit()
         
-        # Emit update to connected clients
-        try:
-            socketio.emit('hashrate_update', {
-                'instance': asdict(hashrate_data),
-                'stats': hashrate_store.get_stats()
-            }, namespace='/', broadcast=True)
-        except Exception as e:
-            logger.warning(f"Failed to emit WebSocket update: {e}")
+        # Queue update for the next broadcast to connected clients
+        update_broadcaster.publish(hashrate_data)
         
         logger.info(f"Received hashrate from {hashrate_data.instance_id}: {hashrate_data.recent_hashrate:.2f} H/s")
         
-        return jsonify({'status': 'success'}), 200
+        return jsonify({'status': 'success'}), 202
         
     except Exception as e:
         logger.error(f"Error processing hashrate data: {e}")
@@ -365,14 +684,13 @@ def get_instances():
             instances = []
         return jsonify(instances)
     else:
-        instances = hashrate_store.get_all()
-        return jsonify([asdict(inst) for inst in instances])
+        return Response(hashrate_store.get_instances_json(), mimetype='application/json')
 
 
 @app.route('/api/stats')
 def get_stats():
     """Get aggregate statistics"""
-    return jsonify(hashrate_store.get_stats())
+    return Response(hashrate_store.get_stats_json(), mimetype='application/json')
 
 
 @app.route('/api/history/<instance_id>')
@@ -390,7 +708,7 @@ def get_instance_history(instance_id):
             return jsonify(history)
         else:
             db = get_db()
-            cutoff = datetime.now() - timedelta(hours=hours)
+            cutoff = sqlite_timestamp(datetime.now() - timedelta(hours=hours))
             
             cursor = db.execute('''
                 SELECT timestamp, recent_hashrate, total_hashes, gpu_count
@@ -416,9 +734,15 @@ def get_instance_history(instance_id):
         return jsonify({'error': str(e)}), 500
 
 
+# Serialized SQLite summary, reused for SUMMARY_TTL seconds
+SUMMARY_TTL = 5
+summary_cache = (float('-inf'), b'')
+
+
 @app.route('/api/summary')
 def get_summary():
     """Get summary statistics for all instances"""
+    global summary_cache
     try:
         if USE_BIGTABLE:
             # For Bigtable, compute summary from current instances
@@ -446,10 +770,14 @@ def get_summary():
                 'peak_hashrate_24h': max(hashrates) if hashrates else 0
             })
         else:
+            computed_at, body = summary_cache
+            if time.monotonic() - computed_at < SUMMARY_TTL:
+                return Response(body, mimetype='application/json')
+            
             db = get_db()
             
             # Get 24-hour statistics
-            cutoff = datetime.now() - timedelta(hours=24)
+            cutoff = sqlite_timestamp(datetime.now() - timedelta(hours=24))
             
             cursor = db.execute('''
                 SELECT 
@@ -457,32 +785,33 @@ def get_summary():
                     SUM(total_hashes) as total_hashes_24h,
                     AVG(recent_hashrate) as avg_hashrate_24h,
                     MAX(recent_hashrate) as peak_hashrate_24h
-            FROM hashrate_history
-            WHERE timestamp > ?
-        ''', (cutoff,))
-        
-        row = cursor.fetchone()
-        
-        # Get current active instances
-        active_instances = hashrate_store.get_all()
-        stats = hashrate_store.get_stats()
-        
-        summary = {
-            'current': {
-                'active_instances': len(active_instances),
-                'total_hashrate': stats['total_hashrate'],
-                'total_gpus': stats['total_gpus'],
-                'avg_hashrate': stats['avg_hashrate']
-            },
-            'last_24h': {
-                'unique_instances': row['unique_instances'] or 0,
-                'total_hashes': row['total_hashes_24h'] or 0,
-                'avg_hashrate': row['avg_hashrate_24h'] or 0,
-                'peak_hashrate': row['peak_hashrate_24h'] or 0
+                FROM hashrate_history
+                WHERE timestamp > ?
+            ''', (cutoff,))
+            
+            row = cursor.fetchone()
+            
+            # Get current active instances
+            stats = hashrate_store.get_stats()
+            
+            summary = {
+                'current': {
+                    'active_instances': stats['total_instances'],
+                    'total_hashrate': stats['total_hashrate'],
+                    'total_gpus': stats['total_gpus'],
+                    'avg_hashrate': stats['avg_hashrate']
+                },
+                'last_24h': {
+                    'unique_instances': row['unique_instances'] or 0,
+                    'total_hashes': row['total_hashes_24h'] or 0,
+                    'avg_hashrate': row['avg_hashrate_24h'] or 0,
+                    'peak_hashrate': row['peak_hashrate_24h'] or 0
+                }
             }
-        }
-        
-        return jsonify(summary)
+            
+            body = orjson.dumps(summary)
+            summary_cache = (time.monotonic(), body)
+            return Response(body, mimetype='application/json')
         
     except Exception as e:
         logger.error(f"Error generating summary: {e}")
@@ -503,7 +832,7 @@ def handle_connect():
         
         # Send initial data
         emit('initial_data', {
-            'instances': [asdict(inst) for inst in hashrate_store.get_all()],
+            'instances': [inst.to_dict() for inst in hashrate_store.get_all()],
             'stats': hashrate_store.get_stats()
         })
     except Exception as e:
@@ -1,15 +1,242 @@
 import os
+import re
 import json
+import time
+import atexit
+import struct
+import zlib
 import tempfile
 import base64
-from datetime import datetime, timedelta
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from google.api_core.exceptions import AlreadyExists
 from google.cloud import bigtable
 from google.cloud.bigtable import column_family
 from google.cloud.bigtable import row_filters
+from google.cloud.bigtable.row_set import RowSet
 import logging
 
+import cachetools
+
+import firehose_monitor
+
 logger = logging.getLogger(__name__)
 
+FLUSH_SIZE = 1000  # Flush buffered writes once this many rows are pending
+FLUSH_INTERVAL = 0.5  # ...or after this many seconds
+MAX_RETRIES = 2  # Extra attempts for rows that fail inside a mutate_rows call
+CLOSE_TIMEOUT = 10  # Seconds to wait for the final flush at shutdown
+CACHE_TTL = 5  # Seconds to serve cached instance and history reads
+HISTORY_CACHE_SIZE = 256  # (instance_id, hours) history results kept
+DELETE_BATCH_SIZE = 1000  # Row deletions per mutate_rows call during cleanup
+READ_CONCURRENCY = 8  # Per-instance reads kept in flight by get_instances
+
+# Row keys are <shard>#instance_id#<reverse_ts>. The shard is a 4 hex digit
+# hash of the instance ID that spreads instances across tablets, and
+# reverse_ts (2^63 minus epoch microseconds, zero-padded to 19 digits) makes
+# an instance's newest row sort first. Older rows are unsharded:
+# instance_id#<reverse_ts>, or legacy instance_id#<iso timestamp>. reverse_ts
+# starts with 9 until the year 9000 while ISO timestamps start with the
+# year, so those two occupy disjoint ranges under each instance prefix.
+# An instance ID that is itself 4 hex digits puts its unsharded and legacy
+# rows under the same prefix as other instances' sharded rows (and one named
+# 'idx' under the index rows), so reads over an instance's ranges keep only
+# the keys _instance_key_filter and _owned_rows attribute to it.
+REVERSE_TS_BASE = 2 ** 63
+INDEX_PREFIX = 'idx#'  # One idx#<instance_id> row per known instance
+# Last key component of a data row: a reverse timestamp or an ISO timestamp
+KEY_SUFFIX = re.compile(rb'[0-9]{19}|[0-9]{4}-[^#]*')
+SPLIT_COUNT = 64  # Tablets pre-split across the shard prefixes at table creation
+TABLET_SPAN = 0x10000 // SPLIT_COUNT  # Shard prefixes per pre-split tablet
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Numeric cells are a version byte followed by a big-endian double or int64;
+# cells written before the binary format hold decimal text
+VALUE_VERSION = b'\x01'
+FLOAT_VALUE = struct.Struct('>d')
+INT_VALUE = struct.Struct('>q')
+# (family, column, datapoint key) for each numeric cell
+FLOAT_COLUMNS = (
+    ('metrics', 'overall_hashrate', 'overall_hashrate'),
+    ('metrics', 'recent_hashrate', 'recent_hashrate'),
+    ('gpu', 'hashrate', 'hashrate'),
+    ('gpu', 'temperature', 'temperature'),
+    ('gpu', 'power', 'power'),
+    ('gpu', 'efficiency', 'efficiency'),
+)
+INT_COLUMNS = (
+    ('instance', 'gpu_count', 'gpu_count'),
+    ('instance', 'gpu_available', 'gpu_available'),
+    ('metrics', 'total_hashes', 'total_hashes'),
+)
+
+
+def _epoch_micros(timestamp):
+    """Parse an ISO timestamp to epoch microseconds (naive values are UTC)"""
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+
+def _shard(instance_id):
+    """Row key shard prefix of an instance"""
+    return f"{zlib.crc32(instance_id.encode('utf-8')) & 0xffff:04x}"
+
+
+def _tablet(instance_id):
+    """Start key of the pre-split tablet holding an instance's sharded rows"""
+    return f"{int(_shard(instance_id), 16) // TABLET_SPAN * TABLET_SPAN:04x}"
+
+
+def _row_prefix(instance_id):
+    return f"{_shard(instance_id)}#{instance_id}#"
+
+
+def _row_key(instance_id, micros):
+    return f"{_row_prefix(instance_id)}{REVERSE_TS_BASE - micros:019d}"
+
+
+def _unsharded_row_key(instance_id, micros):
+    return f"{instance_id}#{REVERSE_TS_BASE - micros:019d}"
+
+
+def _key_instance_id(row_key):
+    """Instance ID of a data row key in any of the key formats"""
+    head = row_key.decode('utf-8').rsplit('#', 1)[0]
+    # Sharded keys start with the shard of the ID that follows; anything
+    # else is an unsharded or legacy key led by the whole ID
+    shard, sep, instance_id = head.partition('#')
+    if sep and shard == _shard(instance_id):
+        return instance_id
+    return head
+
+
+def _owned_rows(rows, instance_id):
+    """Rows whose keys belong to instance_id, skipping other instances' rows
+    (and index rows) that share its key ranges"""
+    for row in rows:
+        suffix = row.row_key.rsplit(b'#', 1)[-1]
+        if KEY_SUFFIX.fullmatch(suffix) and _key_instance_id(row.row_key) == instance_id:
+            yield row
+
+
+def _index_instance_id(row):
+    """Instance ID of an idx# index row, or None for a legacy data row of an
+    instance named 'idx' (index rows hold their ID in instance:id)"""
+    instance_id = row.row_key.decode('utf-8')[len(INDEX_PREFIX):]
+    if _cell(row, 'instance', b'id') == instance_id.encode('utf-8'):
+        return instance_id
+    return None
+
+
+def _key_micros(row_key):
+    """Epoch microseconds encoded in a row key, accepting legacy ISO keys"""
+    suffix = row_key.rsplit(b'#', 1)[1]
+    if suffix.isdigit():
+        return REVERSE_TS_BASE - int(suffix)
+    # Only legacy keys pay for datetime parsing
+    return _epoch_micros(suffix.decode('utf-8'))
+
+
+def _decode_float(value):
+    """Decode a float cell in either the binary or the legacy text format"""
+    if value[:1] == VALUE_VERSION:
+        return FLOAT_VALUE.unpack_from(value, 1)[0]
+    return float(value.decode('utf-8'))
+
+
+def _decode_int(value):
+    """Decode an int cell in either the binary or the legacy text format"""
+    if value[:1] == VALUE_VERSION:
+        return INT_VALUE.unpack_from(value, 1)[0]
+    if value in (b'True', b'False'):
+        return int(value == b'True')
+    return int(value.decode('utf-8'))
+
+
+def _cell(row, family, column):
+    """Latest value of a cell, or None if the row does not have it"""
+    try:
+        return row.cell_value(family, column)
+    except KeyError:
+        return None
+
+
+def _f(row, family, column, default=0):
+    value = _cell(row, family, column)
+    return _decode_float(value) if value is not None else default
+
+
+def _i(row, family, column, default=0):
+    value = _cell(row, family, column)
+    return _decode_int(value) if value is not None else default
+
+
+def _prefix_end(prefix):
+    """Smallest key greater than every key starting with prefix"""
+    return prefix[:-1] + bytes([prefix[-1] + 1])
+
+
+def _latest_range(instance_id):
+    """Key range of an instance's sharded rows, newest first"""
+    prefix = _row_prefix(instance_id)
+    return f"{prefix}9".encode('utf-8'), f"{prefix}:".encode('utf-8')
+
+
+def _unsharded_latest_range(instance_id):
+    """Key range of an instance's unsharded reverse-timestamp rows"""
+    return f"{instance_id}#9".encode('utf-8'), f"{instance_id}#:".encode('utf-8')
+
+
+def _instance_key_filter(instance_id):
+    """Row key filter passing an instance's data rows in every key format,
+    and not the other instances' rows that share its key ranges"""
+    key_regex = (f"^(?:{_shard(instance_id)}#)?{re.escape(instance_id)}"
+                 f"#(?:{KEY_SUFFIX.pattern.decode('utf-8')})$")
+    return row_filters.RowKeyRegexFilter(key_regex.encode('utf-8'))
+
+
+def _live_row_set(instance_id, cutoff):
+    """Row ranges of an instance's rows at or after cutoff, in every key format"""
+    cutoff_micros = _epoch_micros(cutoff.isoformat())
+    row_set = RowSet()
+    # Reverse-timestamp rows newer than the cutoff sort before its key
+    row_set.add_row_range_from_keys(
+        start_key=_latest_range(instance_id)[0],
+        end_key=_row_key(instance_id, cutoff_micros).encode('utf-8'),
+        end_inclusive=True)
+    row_set.add_row_range_from_keys(
+        start_key=_unsharded_latest_range(instance_id)[0],
+        end_key=_unsharded_row_key(instance_id, cutoff_micros).encode('utf-8'),
+        end_inclusive=True)
+    # Legacy ISO rows from the cutoff day onwards sort after the date
+    row_set.add_row_range_from_keys(
+        start_key=f"{instance_id}#{cutoff.date().isoformat()}".encode('utf-8'),
+        end_key=f"{instance_id}#9".encode('utf-8'))
+    return row_set
+
+
+def _expired_row_set(instance_id, cutoff):
+    """Row ranges of an instance's rows before cutoff, in every key format"""
+    cutoff_micros = _epoch_micros(cutoff.isoformat())
+    row_set = RowSet()
+    # Reverse-timestamp rows older than the cutoff sort after its key
+    row_set.add_row_range_from_keys(
+        start_key=_row_key(instance_id, cutoff_micros).encode('utf-8'),
+        end_key=_latest_range(instance_id)[1])
+    row_set.add_row_range_from_keys(
+        start_key=_unsharded_row_key(instance_id, cutoff_micros).encode('utf-8'),
+        end_key=_unsharded_latest_range(instance_id)[1])
+    # Legacy ISO rows sort before the cutoff timestamp
+    row_set.add_row_range_from_keys(
+        start_key=f"{instance_id}#".encode('utf-8'),
+        end_key=f"{instance_id}#{cutoff.isoformat()}".encode('utf-8'))
+    return row_set
+
+
 class BigtableDB:
     def __init__(self):
         project_id = os.environ.get('BIGTABLE_PROJECT_ID')
@@ -71,205 +298,489 @@ class BigtableDB:
         
         self.client = bigtable.Client(project=project_id, admin=False)  # Don't use admin mode
         self.instance = self.client.instance(instance_id)
-        self.table = self.instance.table(table_id)
         
-        # Skip table setup for now - assume table exists
-        logger.info(f"Bigtable table configured: {table_id} (assuming it exists)")
+        # Dashboard reads and batch work (flushes, cleanup) can go through
+        # separate app profiles so cleanup scans never queue ahead of a page
+        # load. Create them once, then set the env vars:
+        #   gcloud bigtable app-profiles create dashboard --instance=INSTANCE \
+        #       --route-to=CLUSTER --priority=PRIORITY_HIGH
+        #   gcloud bigtable app-profiles create batch --instance=INSTANCE \
+        #       --route-to=CLUSTER --priority=PRIORITY_LOW
+        # Unset, both use the instance's default profile.
+        dashboard_profile = os.environ.get('BIGTABLE_DASHBOARD_APP_PROFILE')
+        batch_profile = os.environ.get('BIGTABLE_BATCH_APP_PROFILE')
+        self.dashboard_table = self.instance.table(table_id, app_profile_id=dashboard_profile)
+        self.batch_table = self.instance.table(table_id, app_profile_id=batch_profile)
+        
+        # Table creation needs an admin client, so it is opt-in; otherwise
+        # assume the table exists
+        if os.environ.get('BIGTABLE_SETUP_TABLE', 'false').lower() == 'true':
+            self._setup_table(project_id, instance_id, table_id)
+        else:
+            logger.info(f"Bigtable table configured: {table_id} (assuming it exists)")
+        
+        # Buffered writes, flushed by size or by the flush thread
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._closed = threading.Event()
+        self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+        # Accepted datapoints still buffered at shutdown are written, not dropped
+        atexit.register(self.close)
+        
+        # Instances whose rows predate the index get idx# rows once per
+        # process, off the read path (started below, once the filters exist)
+        self._index_backfilled = False
+        self._backfill_lock = threading.Lock()
+        
+        # Rows are read for their latest values only
+        self._latest_filter = row_filters.CellsColumnLimitFilter(1)
+        
+        # Index rows are told apart from an 'idx' instance's legacy rows by
+        # their instance:id cell, the only 'id' qualifier in the table
+        self._id_filter = row_filters.RowFilterChain(filters=[
+            row_filters.ColumnQualifierRegexFilter(b'id'),
+            row_filters.CellsColumnLimitFilter(1),
+        ])
+        
+        # Keys only: one stripped cell per row
+        self._keys_only_filter = row_filters.RowFilterChain(filters=[
+            row_filters.CellsRowLimitFilter(1),
+            row_filters.StripValueTransformerFilter(True),
+        ])
+        
+        # Per-instance latest-row reads are fanned out so their round trips overlap
+        self._read_pool = ThreadPoolExecutor(max_workers=READ_CONCURRENCY,
+                                             thread_name_prefix='bigtable-read')
+        
+        # Short-lived read caches, invalidated when a flush writes new rows
+        self._cache_lock = threading.RLock()
+        self._instances_cache = cachetools.TTLCache(maxsize=1, ttl=CACHE_TTL)
+        self._history_cache = cachetools.TTLCache(maxsize=HISTORY_CACHE_SIZE, ttl=CACHE_TTL)
+        
+        # History reads only need the three charted cells and the original
+        # timestamp string, latest version each. The qualifiers are unique
+        # across families, so no family filter is needed.
+        self._history_filter = row_filters.RowFilterChain(filters=[
+            row_filters.ColumnQualifierRegexFilter(b'timestamp|overall_hashrate|temperature|power'),
+            row_filters.CellsColumnLimitFilter(1),
+        ])
+        
+        self.backfill_thread = threading.Thread(target=self._backfill_index, daemon=True)
+        self.backfill_thread.start()
     
-    def _setup_table(self):
+    def _setup_table(self, project_id, instance_id, table_id):
         """Create table and column families if they don't exist"""
         try:
+            admin_instance = bigtable.Client(project=project_id, admin=True).instance(instance_id)
+            admin_table = admin_instance.table(table_id)
+            
             # Check if table exists
-            existing_tables = self.instance.list_tables()
-            table_exists = any(t.table_id == self.table.table_id for t in existing_tables)
+            existing_tables = admin_instance.list_tables()
+            table_exists = any(t.table_id == table_id for t in existing_tables)
             
             if not table_exists:
-                logger.info(f"Creating Bigtable table: {self.table.table_id}")
+                logger.info(f"Creating Bigtable table: {table_id}")
                 max_versions_rule = column_family.MaxVersionsGCRule(1)
                 column_families = {
                     'instance': max_versions_rule,
                     'metrics': max_versions_rule,
                     'gpu': max_versions_rule
                 }
-                self.table.create(column_families=column_families)
-                logger.info("Bigtable table created successfully")
+                # Start with one tablet per 1/SPLIT_COUNT of the shard space
+                # instead of splitting reactively under the first writes
+                split_keys = [f"{i:04x}".encode('utf-8')
+                              for i in range(TABLET_SPAN, 0x10000, TABLET_SPAN)]
+                try:
+                    admin_table.create(column_families=column_families,
+                                       initial_split_keys=split_keys)
+                    logger.info("Bigtable table created successfully")
+                except AlreadyExists:
+                    logger.info(f"Bigtable table {table_id} already exists")
         except Exception as e:
             logger.error(f"Error setting up Bigtable: {e}")
     
+    def _build_row(self, data):
+        """Build an uncommitted row for one hashrate datapoint"""
+        timestamp = data.get('timestamp', datetime.utcnow().isoformat())
+        try:
+            micros = _epoch_micros(timestamp)
+        except (ValueError, TypeError):
+            micros = time.time_ns() // 1000
+        row_key = _row_key(data['instance_id'], micros)
+        
+        row = self.batch_table.direct_row(row_key)
+        
+        # Instance data
+        row.set_cell('instance', 'id', data['instance_id'])
+        row.set_cell('instance', 'timestamp', str(timestamp))
+        if data.get('gpu_name') is not None:
+            row.set_cell('gpu', 'name', data['gpu_name'])
+        
+        # Numeric data, GPU columns being optional (and null when unreported)
+        for family, column, key in FLOAT_COLUMNS:
+            if data.get(key) is not None:
+                row.set_cell(family, column, VALUE_VERSION + FLOAT_VALUE.pack(float(data[key])))
+        for family, column, key in INT_COLUMNS:
+            if data.get(key) is not None:
+                row.set_cell(family, column, VALUE_VERSION + INT_VALUE.pack(int(data[key])))
+        
+        return row
+    
+    def _build_index_row(self, data):
+        """Build the idx# row recording that an instance exists"""
+        row = self.batch_table.direct_row(f"{INDEX_PREFIX}{data['instance_id']}")
+        row.set_cell('instance', 'id', data['instance_id'])
+        row.set_cell('instance', 'timestamp', str(data.get('timestamp', datetime.utcnow().isoformat())))
+        return row
+    
     def save_hashrate(self, data):
-        """Save hashrate data to Bigtable"""
+        """Buffer hashrate data for the next batched write to Bigtable"""
+        with self._pending_lock:
+            self._pending.append(data)
+            if len(self._pending) >= FLUSH_SIZE:
+                self._flush_requested.set()
+        return True
+    
+    def flush(self):
+        """Write all buffered datapoints now, returning how many succeeded"""
+        with self._pending_lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        return self.save_hashrate_batch(batch)
+    
+    def _flush_loop(self):
+        """Flush buffered writes every FLUSH_INTERVAL or when the buffer fills"""
+        while True:
+            self._flush_requested.wait(FLUSH_INTERVAL)
+            self._flush_requested.clear()
+            # Checked before flushing, so the last pass writes what close() left
+            closed = self._closed.is_set()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Bigtable flush error: {e}")
+            if closed:
+                return
+    
+    def close(self):
+        """Write everything still buffered and stop the flush thread"""
+        self._closed.set()
+        self._flush_requested.set()
+        self.flush_thread.join(CLOSE_TIMEOUT)
+    
+    def save_hashrate_batch(self, data_list):
+        """Save many hashrate datapoints with mutate_rows, returning how many succeeded"""
+        rows = []
+        written = []
+        for data in data_list:
+            # A malformed datapoint is dropped on its own, not with the batch
+            try:
+                rows.append(self._build_row(data))
+            except Exception as e:
+                logger.error(f"Skipping malformed datapoint from {data.get('instance_id')}: {e}")
+                continue
+            written.append(data)
+        
+        if not rows:
+            return 0
+        
+        # Refresh the index row of every instance in the batch
+        latest = {data['instance_id']: data for data in written}
+        index_rows = [self._build_index_row(data) for data in latest.values()]
+        
+        pending = rows + index_rows
+        retries = 0
         try:
-            # Create row key: instance_id#timestamp
-            timestamp = data.get('timestamp', datetime.utcnow().isoformat())
-            row_key = f"{data['instance_id']}#{timestamp}"
-            
-            logger.info(f"Attempting to save data with row key: {row_key}")
-            row = self.table.direct_row(row_key)
+            for attempt in range(MAX_RETRIES + 1):
+                statuses = self.batch_table.mutate_rows(pending)
+                failed = [
+                    (row, status) for row, status in zip(pending, statuses)
+                    if status.code != 0
+                ]
+                if not failed or attempt == MAX_RETRIES:
+                    break
+                # Retry only the rows that failed
+                retries += 1
+                pending = [row for row, _ in failed]
             
-            # Instance data
-            row.set_cell('instance', 'id', data['instance_id'])
-            row.set_cell('instance', 'timestamp', timestamp)
-            row.set_cell('instance', 'gpu_count', str(data['gpu_count']))
-            row.set_cell('instance', 'gpu_available', str(data['gpu_available']))
-            
-            # Metrics data
-            row.set_cell('metrics', 'total_hashes', str(data['total_hashes']))
-            row.set_cell('metrics', 'overall_hashrate', str(data['overall_hashrate']))
-            row.set_cell('metrics', 'recent_hashrate', str(data['recent_hashrate']))
+            for row, status in failed:
+                logger.error(f"Error saving row {row.row_key}: {status.message}")
+            failed_keys = [row.row_key for row, _ in failed]
+        except Exception as e:
+            logger.error(f"Error saving batch to Bigtable: {e}")
+            failed_keys = [row.row_key for row in pending]
+        
+        index_prefix = INDEX_PREFIX.encode('utf-8')
+        failed_count = sum(1 for key in failed_keys if not key.startswith(index_prefix))
+        
+        if failed_count < len(rows):
+            self._invalidate_cache(latest)
+        
+        # Per pre-split tablet, so the report stays SPLIT_COUNT entries at most
+        tablet_stats = Counter(_tablet(data['instance_id']) for data in written)
+        self._record_batch(len(rows), failed_count == 0, retries, tablet_stats)
+        return len(rows) - failed_count
+    
+    def _invalidate_cache(self, instance_ids):
+        """Drop cached reads that a write to these instances made stale"""
+        with self._cache_lock:
+            self._instances_cache.pop('all', None)
+            for key in [key for key in self._history_cache if key[0] in instance_ids]:
+                self._history_cache.pop(key, None)
+    
+    def _record_batch(self, batch_size, success, retry_count, tablet_stats):
+        """Report a mutate_rows batch to the firehose monitor, if running"""
+        monitor = firehose_monitor.firehose_monitor
+        if monitor:
+            # Through the ingress queue, so only its thread touches the counters
+            monitor.enqueue_update({
+                'batch': {'size': batch_size, 'success': success, 'retries': retry_count,
+                          'capacity': FLUSH_SIZE},
+                'shards': dict(tablet_stats)
+            })
+    
+    def _instance_from_row(self, instance_id, row):
+        """Build the instance summary dict from its latest row"""
+        timestamp = _cell(row, 'instance', b'timestamp')
+        gpu_name = _cell(row, 'gpu', b'name')
+        return {
+            'instance_id': instance_id,
+            'last_seen': timestamp.decode('utf-8') if timestamp is not None else None,
+            'hashrate': _f(row, 'metrics', b'overall_hashrate'),
+            'temperature': _f(row, 'gpu', b'temperature'),
+            'gpu_name': gpu_name.decode('utf-8') if gpu_name is not None else 'Unknown',
+            'power': _f(row, 'gpu', b'power'),
+            'efficiency': _f(row, 'gpu', b'efficiency'),
+            'gpu_count': _i(row, 'instance', b'gpu_count'),
+            'gpu_available': int(_i(row, 'instance', b'gpu_available') != 0),
+            'total_hashes': _i(row, 'metrics', b'total_hashes')
+        }
+    
+    def _get_instance_ids(self, table):
+        """Instance IDs recorded in the idx# index rows"""
+        index_prefix = INDEX_PREFIX.encode('utf-8')
+        rows = table.read_rows(start_key=index_prefix, end_key=_prefix_end(index_prefix),
+                               filter_=self._id_filter)
+        instance_ids = (_index_instance_id(row) for row in rows)
+        return [instance_id for instance_id in instance_ids if instance_id is not None]
+    
+    def _scan_instance_ids(self, table):
+        """Instance IDs from a full scan of the ID cells, used to backfill the index"""
+        index_prefix = INDEX_PREFIX.encode('utf-8')
+        instance_ids = set()
+        for row in table.read_rows(filter_=self._id_filter):
+            if row.row_key.startswith(index_prefix) and _index_instance_id(row) is not None:
+                continue
+            instance_ids.add(_key_instance_id(row.row_key))
+        return list(instance_ids)
+    
+    def _ensure_index(self, table):
+        """Backfill idx# rows for instances only found by a full scan"""
+        with self._backfill_lock:
+            if self._index_backfilled:
+                return
+            indexed = set(self._get_instance_ids(table))
+            missing = [instance_id for instance_id in self._scan_instance_ids(table)
+                       if instance_id not in indexed]
             
-            # Optional GPU data
-            if 'hashrate' in data:
-                row.set_cell('gpu', 'hashrate', str(data['hashrate']))
-            if 'temperature' in data:
-                row.set_cell('gpu', 'temperature', str(data['temperature']))
-            if 'gpu_name' in data:
-                row.set_cell('gpu', 'name', data['gpu_name'])
-            if 'power' in data:
-                row.set_cell('gpu', 'power', str(data['power']))
-            if 'efficiency' in data:
-                row.set_cell('gpu', 'efficiency', str(data['efficiency']))
+            index_rows = [self._build_index_row({'instance_id': instance_id})
+                          for instance_id in missing]
             
-            row.commit()
-            return True
+            if index_rows:
+                statuses = self.batch_table.mutate_rows(index_rows)
+                failed = sum(1 for status in statuses if status.code != 0)
+                # Not retried: a rescan costs as much as the first one
+                if failed:
+                    logger.error(f"Failed to backfill {failed} of {len(index_rows)} index rows")
+                logger.info(f"Backfilled {len(index_rows) - failed} Bigtable index rows")
+            self._index_backfilled = True
+    
+    def _backfill_index(self):
+        """Backfill the index once at startup; cleanup retries if this fails"""
+        try:
+            self._ensure_index(self.batch_table)
         except Exception as e:
-            logger.error(f"Error saving to Bigtable: {e}")
-            return False
+            logger.error(f"Error backfilling Bigtable index: {e}")
     
     def get_instances(self):
         """Get all unique instances with their latest data"""
+        key = 'all'
+        with self._cache_lock:
+            cached = self._instances_cache.get(key)
+        if cached is not None:
+            return cached
+        
         try:
-            instances = {}
-            
-            # Read all rows
-            rows = self.table.read_rows()
-            
-            for row in rows:
-                # Parse row key
-                instance_id = row.row_key.decode('utf-8').split('#')[0]
-                
-                # Get cell data
-                cells = row.cells
-                
-                if instance_id not in instances:
-                    instance_data = {
-                        'instance_id': instance_id,
-                        'last_seen': None,
-                        'hashrate': 0,
-                        'temperature': 0,
-                        'gpu_name': 'Unknown',
-                        'power': 0,
-                        'efficiency': 0,
-                        'gpu_count': 0,
-                        'gpu_available': 0,
-                        'total_hashes': 0
-                    }
-                    
-                    # Get latest values from cells
-                    if 'instance' in cells:
-                        if 'timestamp' in cells['instance']:
-                            instance_data['last_seen'] = cells['instance']['timestamp'][0].value.decode('utf-8')
-                        if 'gpu_count' in cells['instance']:
-                            instance_data['gpu_count'] = int(cells['instance']['gpu_count'][0].value.decode('utf-8'))
-                        if 'gpu_available' in cells['instance']:
-                            instance_data['gpu_available'] = int(cells['instance']['gpu_available'][0].value.decode('utf-8'))
-                    
-                    if 'metrics' in cells:
-                        if 'overall_hashrate' in cells['metrics']:
-                            instance_data['hashrate'] = float(cells['metrics']['overall_hashrate'][0].value.decode('utf-8'))
-                        if 'total_hashes' in cells['metrics']:
-                            instance_data['total_hashes'] = int(cells['metrics']['total_hashes'][0].value.decode('utf-8'))
-                    
-                    if 'gpu' in cells:
-                        if 'temperature' in cells['gpu']:
-                            instance_data['temperature'] = float(cells['gpu']['temperature'][0].value.decode('utf-8'))
-                        if 'name' in cells['gpu']:
-                            instance_data['gpu_name'] = cells['gpu']['name'][0].value.decode('utf-8')
-                        if 'power' in cells['gpu']:
-                            instance_data['power'] = float(cells['gpu']['power'][0].value.decode('utf-8'))
-                        if 'efficiency' in cells['gpu']:
-                            instance_data['efficiency'] = float(cells['gpu']['efficiency'][0].value.decode('utf-8'))
-                    
-                    instances[instance_id] = instance_data
-            
-            return list(instances.values())
+            result = self._read_instances()
         except Exception as e:
             logger.error(f"Error getting instances from Bigtable: {e}")
             return []
+        
+        with self._cache_lock:
+            self._instances_cache[key] = result
+        return result
+    
+    def _read_instances(self):
+        """Read all unique instances with their latest data from Bigtable"""
+        instance_ids = self._get_instance_ids(self.dashboard_table)
+        if not instance_ids:
+            # Tables written before the index existed
+            return self._get_instances_legacy()
+        
+        latest = self._read_pool.map(self._read_latest, instance_ids)
+        return [instance for instance in latest if instance is not None]
+    
+    def _read_latest(self, instance_id):
+        """Read one instance's latest row, or None if it has no rows"""
+        # The key filter drops other instances' rows server-side, so the
+        # limit counts only this instance's
+        latest_filter = row_filters.RowFilterChain(filters=[
+            _instance_key_filter(instance_id),
+            self._latest_filter,
+        ])
+        
+        # Reverse timestamps put the newest row first; instances with no
+        # sharded rows yet fall back to their unsharded ones
+        for start_key, end_key in (_latest_range(instance_id), _unsharded_latest_range(instance_id)):
+            rows = list(_owned_rows(self.dashboard_table.read_rows(
+                start_key=start_key, end_key=end_key, limit=1, filter_=latest_filter), instance_id))
+            if rows:
+                return self._instance_from_row(instance_id, rows[0])
+        
+        # Legacy ISO keys sort oldest first, so the newest is the last row
+        rows = list(_owned_rows(self.dashboard_table.read_rows(
+            start_key=f"{instance_id}#0".encode('utf-8'),
+            end_key=f"{instance_id}#9".encode('utf-8'),
+            filter_=latest_filter), instance_id))
+        if rows:
+            return self._instance_from_row(instance_id, rows[-1])
+        return None
+    
+    def _get_instances_legacy(self):
+        """Full-table scan for instances in tables written before the index existed"""
+        instances = {}
+        index_prefix = INDEX_PREFIX.encode('utf-8')
+        
+        for row in self.dashboard_table.read_rows(filter_=self._latest_filter):
+            if row.row_key.startswith(index_prefix) and _index_instance_id(row) is not None:
+                continue
+            # Parse row key
+            instance_id = _key_instance_id(row.row_key)
+            if instance_id not in instances:
+                instances[instance_id] = self._instance_from_row(instance_id, row)
+        
+        return list(instances.values())
     
     def get_instance_history(self, instance_id, hours=24):
         """Get history for a specific instance"""
+        key = (instance_id, hours)
+        with self._cache_lock:
+            cached = self._history_cache.get(key)
+        if cached is not None:
+            return cached
+        
         try:
-            history = []
-            
-            # Create row prefix for the instance
-            row_prefix = f"{instance_id}#"
-            
-            # Calculate time filter
-            cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-            
-            # Read rows with prefix
-            rows = self.table.read_rows(row_prefix=row_prefix.encode('utf-8'))
-            
-            for row in rows:
-                # Parse timestamp from row key
-                timestamp_str = row.row_key.decode('utf-8').split('#')[1]
-                timestamp = datetime.fromisoformat(timestamp_str)
-                
-                # Skip old entries
-                if timestamp < cutoff_time:
-                    continue
-                
-                cells = row.cells
-                data_point = {
-                    'timestamp': timestamp_str,
-                    'hashrate': 0,
-                    'temperature': 0,
-                    'power': 0
-                }
-                
-                if 'metrics' in cells and 'overall_hashrate' in cells['metrics']:
-                    data_point['hashrate'] = float(cells['metrics']['overall_hashrate'][0].value.decode('utf-8'))
-                
-                if 'gpu' in cells:
-                    if 'temperature' in cells['gpu']:
-                        data_point['temperature'] = float(cells['gpu']['temperature'][0].value.decode('utf-8'))
-                    if 'power' in cells['gpu']:
-                        data_point['power'] = float(cells['gpu']['power'][0].value.decode('utf-8'))
-                
-                history.append(data_point)
-            
-            # Sort by timestamp
-            history.sort(key=lambda x: x['timestamp'])
-            
-            return history
+            result = self._read_instance_history(instance_id, hours)
         except Exception as e:
             logger.error(f"Error getting history from Bigtable: {e}")
             return []
+        
+        with self._cache_lock:
+            self._history_cache[key] = result
+        return result
+    
+    def _read_instance_history(self, instance_id, hours):
+        """Read history for a specific instance from Bigtable"""
+        history = []
+        
+        # Calculate time filter
+        cutoff = datetime.utcnow() - timedelta(hours=hours)
+        row_set = _live_row_set(instance_id, cutoff)
+        
+        # Cells written before the cutoff are dropped server-side, which
+        # trims the legacy rows from earlier on the cutoff day
+        history_filter = row_filters.RowFilterChain(filters=[
+            _instance_key_filter(instance_id),
+            row_filters.TimestampRangeFilter(row_filters.TimestampRange(
+                start=cutoff.replace(tzinfo=timezone.utc))),
+            self._history_filter,
+        ])
+        
+        rows = _owned_rows(self.dashboard_table.read_rows(row_set=row_set, filter_=history_filter),
+                           instance_id)
+        
+        for row in rows:
+            # Parse timestamp from row key
+            micros = _key_micros(row.row_key)
+            
+            timestamp = _cell(row, 'instance', b'timestamp')
+            if timestamp is not None:
+                timestamp_str = timestamp.decode('utf-8')
+            else:
+                timestamp_str = (EPOCH + timedelta(microseconds=micros)).replace(tzinfo=None).isoformat()
+            
+            data_point = {
+                'timestamp': timestamp_str,
+                'hashrate': _f(row, 'metrics', b'overall_hashrate'),
+                'temperature': _f(row, 'gpu', b'temperature'),
+                'power': _f(row, 'gpu', b'power')
+            }
+            
+            history.append((micros, data_point))
+        
+        # Sort by timestamp
+        history.sort(key=lambda x: x[0])
+        
+        return [data_point for _, data_point in history]
+    
+    def _delete_rows(self, mutations):
+        """Apply a batch of row deletions, returning how many succeeded"""
+        statuses = self.batch_table.mutate_rows(mutations)
+        return sum(1 for status in statuses if status.code == 0)
     
     def cleanup_old_records(self, days=7):
         """Delete records older than specified days"""
         try:
-            cutoff_time = datetime.utcnow() - timedelta(days=days)
+            cutoff = datetime.utcnow() - timedelta(days=days)
             deleted_count = 0
             
-            rows = self.table.read_rows()
+            batch = []
+            # Every instance must be indexed, or its legacy rows are never visited
+            self._ensure_index(self.batch_table)
             
-            for row in rows:
-                # Parse timestamp from row key
-                try:
-                    timestamp_str = row.row_key.decode('utf-8').split('#')[1]
-                    timestamp = datetime.fromisoformat(timestamp_str)
-                    
-                    if timestamp < cutoff_time:
-                        row.delete()
-                        row.commit()
-                        deleted_count += 1
-                except Exception as e:
-                    logger.error(f"Error parsing row {row.row_key}: {e}")
-                    continue
+            for instance_id in self._get_instance_ids(self.batch_table):
+                row_set = _expired_row_set(instance_id, cutoff)
+                # Other instances' rows in these ranges must never be deleted
+                owned_keys_only = row_filters.RowFilterChain(filters=[
+                    _instance_key_filter(instance_id),
+                    self._keys_only_filter,
+                ])
+                
+                rows = self.batch_table.read_rows(row_set=row_set, filter_=owned_keys_only)
+                for row in _owned_rows(rows, instance_id):
+                    mutation = self.batch_table.direct_row(row.row_key)
+                    mutation.delete()
+                    batch.append(mutation)
+                    if len(batch) >= DELETE_BATCH_SIZE:
+                        deleted_count += self._delete_rows(batch)
+                        batch.clear()
+                
+                # Drop the index entry once an instance has no unexpired rows
+                live_set = _live_row_set(instance_id, cutoff)
+                remaining = self.batch_table.read_rows(row_set=live_set, filter_=owned_keys_only, limit=1)
+                if not any(True for _ in _owned_rows(remaining, instance_id)):
+                    index_row = self.batch_table.direct_row(f"{INDEX_PREFIX}{instance_id}".encode('utf-8'))
+                    index_row.delete()
+                    index_row.commit()
+            
+            if batch:
+                deleted_count += self._delete_rows(batch)
             
             logger.info(f"Deleted {deleted_count} old records from Bigtable")
             return deleted_count
         except Exception as e:
             logger.error(f"Error cleaning up Bigtable: {e}")
-            return 0
\ No newline at end of file
+            return 0
@@ -5,15 +5,19 @@ Integrates firehose pipeline monitoring with the existing dashboard.
 """
 
 import os
+import gzip
 import time
 import json
+import hashlib
 import logging
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from collections import deque
 import threading
-from flask import Blueprint, jsonify, render_template_string, request
+import numpy as np
+import orjson
+from flask import Blueprint, Response, jsonify, request
 
 # Configure logging
 logging.basicConfig(
@@ -22,8 +26,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+INGRESS_MAXLEN = 10000  # Queued /api/firehose/update payloads before the oldest are dropped
+INGRESS_BATCH_SIZE = 256  # Payloads folded into one round of updates
+INGRESS_INTERVAL = 0.005  # Seconds to let payloads accumulate after a wakeup
+DEFAULT_BATCH_CAPACITY = 5000  # Rows a reported batch could hold, unless it says
+MAX_REPORTED_VALUE = 2 ** 32  # Largest reported metric accepted; keeps summed counters far inside int64
+INT64_MAX = 2 ** 63 - 1  # Integer history columns are clamped to int64
 
-@dataclass
+# Numeric fields accepted in each section of an /api/firehose/update report
+UPDATE_NUMERIC_FIELDS = {
+    'bigtable': ('writes_per_second', 'latency_ms', 'error_rate'),
+    'buffer': ('queue_depth', 'lag_seconds', 'messages_buffered'),
+    'workers': ('pool_size', 'utilization', 'batch_efficiency'),
+    'batch': ('size', 'retries', 'capacity'),
+}
+
+# One metrics_history row per monitor tick
+HISTORY_DTYPE = np.dtype([
+    ('timestamp', 'f8'),
+    ('total_writes', 'i8'),
+    ('failed_writes', 'i8'),
+    ('messages_processed', 'i8'),
+    ('write_latency_ms', 'f8'),
+    ('error_rate', 'f8'),
+    ('queue_depth', 'i8'),
+    ('buffer_lag_seconds', 'f8'),
+])
+
+
+@dataclass(slots=True)
 class FirehoseMetrics:
     """Firehose-specific metrics"""
     bigtable_writes_per_second: float = 0
@@ -34,8 +65,27 @@ class FirehoseMetrics:
     worker_pool_size: int = 0
     worker_utilization: float = 0
     shard_distribution: Dict[str, int] = None
+    shard_rows_written: Dict[str, int] = None  # Cumulative rows per pre-split tablet from flushes
     batch_efficiency: float = 0
     retry_rate: float = 0
+    
+    def to_dict(self) -> Dict:
+        """Plain dict of the metrics, copying the shard maps"""
+        return {
+            'bigtable_writes_per_second': self.bigtable_writes_per_second,
+            'bigtable_write_latency_ms': self.bigtable_write_latency_ms,
+            'bigtable_error_rate': self.bigtable_error_rate,
+            'buffer_queue_depth': self.buffer_queue_depth,
+            'buffer_lag_seconds': self.buffer_lag_seconds,
+            'worker_pool_size': self.worker_pool_size,
+            'worker_utilization': self.worker_utilization,
+            'shard_distribution': (dict(self.shard_distribution)
+                                   if self.shard_distribution is not None else None),
+            'shard_rows_written': (dict(self.shard_rows_written)
+                                   if self.shard_rows_written is not None else None),
+            'batch_efficiency': self.batch_efficiency,
+            'retry_rate': self.retry_rate
+        }
 
 
 class FirehoseMonitor:
@@ -43,12 +93,25 @@ class FirehoseMonitor:
     
     def __init__(self, window_size: int = 300):
         self.window_size = window_size
-        self.metrics_history = deque(maxlen=window_size)
+        
+        # Ring buffer of the last window_size snapshots
+        self.metrics_history = np.zeros(window_size, dtype=HISTORY_DTYPE)
+        self._history_index = 0
+        self._history_count = 0
+        self._history_summary = (None, {})
         
         # Metrics storage
         self.current_metrics = FirehoseMetrics()
+        
+        # current_metrics.to_dict() memoized until the metrics change
+        self._metrics_version = 0
+        self._metrics_snapshot = (-1, None)
+        self._metrics_json = (-1, b'')
         self.alerts = deque(maxlen=100)
         
+        # Rows the recorded batches could have held, for batch_efficiency
+        self._batch_capacity = 0
+        
         # Performance counters
         self.counters = {
             'total_writes': 0,
@@ -68,10 +131,16 @@ class FirehoseMonitor:
             'worker_utilization': 0.9
         }
         
-        # Start monitoring thread
-        self.running = True
-        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        # History snapshots are taken from get_metrics, at most one per interval
+        self.history_interval = 5
+        self._last_snapshot = 0.0
+        
+        # Worker reports are queued and applied in batches by one thread
+        self._ingress = deque(maxlen=INGRESS_MAXLEN)
+        self._ingress_lock = threading.Lock()
+        self._ingress_ready = threading.Event()
+        self.ingress_thread = threading.Thread(target=self._ingress_loop, daemon=True)
+        self.ingress_thread.start()
     
     def update_bigtable_metrics(self, writes_per_sec: float, latency_ms: float, 
                                 error_rate: float, shard_stats: Dict[str, int]):
@@ -83,6 +152,7 @@ class FirehoseMonitor:
         
         # Update counters
         self.counters['total_writes'] += int(writes_per_sec)
+        self._metrics_changed()
         
         # Check for alerts
         if latency_ms > self.thresholds['write_latency_ms']:
@@ -97,6 +167,7 @@ class FirehoseMonitor:
         self.current_metrics.buffer_queue_depth = queue_depth
         self.current_metrics.buffer_lag_seconds = lag_seconds
         self.counters['messages_buffered'] += messages_buffered
+        self._metrics_changed()
         
         # Check for alerts
         if queue_depth > self.thresholds['queue_depth']:
@@ -111,15 +182,20 @@ class FirehoseMonitor:
         self.current_metrics.worker_pool_size = pool_size
         self.current_metrics.worker_utilization = utilization
         self.current_metrics.batch_efficiency = batch_efficiency
+        self._metrics_changed()
         
         # Check for alerts
         if utilization > self.thresholds['worker_utilization']:
             self._add_alert('info', f'High worker utilization: {utilization:.1%}')
     
-    def record_batch(self, batch_size: int, success: bool, retry_count: int = 0):
-        """Record a batch write operation"""
-        self.counters['total_batches'] += 1
+    def record_batch(self, batch_size: int, success: bool, retry_count: int = 0,
+                     batch_count: int = 1, batch_capacity: Optional[int] = None):
+        """Record a batch write operation (or batch_count of them, summed)"""
+        self.counters['total_batches'] += batch_count
         self.counters['messages_processed'] += batch_size
+        if batch_capacity is None:
+            batch_capacity = batch_count * DEFAULT_BATCH_CAPACITY
+        self._batch_capacity += batch_capacity
         
         if not success:
             self.counters['failed_writes'] += batch_size
@@ -130,6 +206,151 @@ class FirehoseMonitor:
                 self.counters['total_retries'] / 
                 max(1, self.counters['total_batches'])
             )
+        
+        # Calculate derived metrics
+        self.current_metrics.batch_efficiency = (
+            self.counters['messages_processed'] / max(1, self._batch_capacity)
+        )
+        self._metrics_changed()
+    
+    def _add_shard_counts(self, shard_stats: Dict[str, int]):
+        """Accumulate rows written per pre-split tablet (keyed by its start key)"""
+        rows_written = self.current_metrics.shard_rows_written or {}
+        for shard, count in shard_stats.items():
+            rows_written[shard] = rows_written.get(shard, 0) + count
+        self.current_metrics.shard_rows_written = rows_written
+    
+    def enqueue_update(self, data: Dict):
+        """Queue a worker report for the ingress thread"""
+        with self._ingress_lock:
+            self._ingress.append(data)
+        self._ingress_ready.set()
+    
+    def _ingress_loop(self):
+        """Apply queued worker reports in batches"""
+        while True:
+            self._ingress_ready.wait()
+            time.sleep(INGRESS_INTERVAL)
+            self._ingress_ready.clear()
+            while True:
+                with self._ingress_lock:
+                    count = min(INGRESS_BATCH_SIZE, len(self._ingress))
+                    updates = [self._ingress.popleft() for _ in range(count)]
+                if not updates:
+                    break
+                
+                # Drop malformed reports on their own before folding the rest
+                valid = []
+                for update in updates:
+                    error = _update_error(update)
+                    if error:
+                        logger.error(f"Dropping firehose update: {error}")
+                    else:
+                        valid.append(update)
+                try:
+                    self._apply_updates(valid)
+                except Exception as e:
+                    logger.error(f"Error applying firehose updates: {e}")
+    
+    def _apply_updates(self, updates: List[Dict]):
+        """Fold worker reports into one call per kind of update"""
+        bigtable = [u['bigtable'] for u in updates if 'bigtable' in u]
+        if bigtable:
+            # Peak latency and error rate, latest rate and shards; the last
+            # report's writes are counted by update_bigtable_metrics
+            self.update_bigtable_metrics(
+                writes_per_sec=bigtable[-1].get('writes_per_second', 0),
+                latency_ms=max(b.get('latency_ms', 0) for b in bigtable),
+                error_rate=max(b.get('error_rate', 0) for b in bigtable),
+                shard_stats=bigtable[-1].get('shard_stats', {})
+            )
+            self.counters['total_writes'] += sum(
+                int(b.get('writes_per_second', 0)) for b in bigtable[:-1])
+        
+        buffer = [u['buffer'] for u in updates if 'buffer' in u]
+        if buffer:
+            self.update_buffer_metrics(
+                queue_depth=max(b.get('queue_depth', 0) for b in buffer),
+                lag_seconds=max(b.get('lag_seconds', 0) for b in buffer),
+                messages_buffered=sum(b.get('messages_buffered', 0) for b in buffer)
+            )
+        
+        workers = [u['workers'] for u in updates if 'workers' in u]
+        if workers:
+            self.update_worker_metrics(
+                pool_size=workers[-1].get('pool_size', 0),
+                utilization=workers[-1].get('utilization', 0),
+                batch_efficiency=workers[-1].get('batch_efficiency', 0)
+            )
+        
+        batches = [u['batch'] for u in updates if 'batch' in u]
+        for success in (True, False):
+            matching = [b for b in batches if b.get('success', True) == success]
+            if matching:
+                self.record_batch(
+                    batch_size=sum(b.get('size', 0) for b in matching),
+                    success=success,
+                    retry_count=sum(b.get('retries', 0) for b in matching),
+                    batch_count=len(matching),
+                    batch_capacity=sum(b.get('capacity', DEFAULT_BATCH_CAPACITY) for b in matching)
+                )
+        
+        # Per-tablet row counts reported by BigtableDB flushes
+        shards = [u['shards'] for u in updates if 'shards' in u]
+        if shards:
+            totals = {}
+            for counts in shards:
+                for shard, count in counts.items():
+                    totals[shard] = totals.get(shard, 0) + count
+            self._add_shard_counts(totals)
+        self._metrics_changed()
+    
+    def _metrics_changed(self):
+        """Invalidate the memoized metrics snapshot and serialized metrics"""
+        self._metrics_version += 1
+    
+    def _metrics_dict(self) -> Dict:
+        """current_metrics as a dict, rebuilt only after it changed"""
+        version = self._metrics_version
+        cached_version, snapshot = self._metrics_snapshot
+        if cached_version != version:
+            snapshot = self.current_metrics.to_dict()
+            self._metrics_snapshot = (version, snapshot)
+        return snapshot
+    
+    def get_metrics_json(self) -> bytes:
+        """get_metrics() serialized, cached until the monitor changes"""
+        self._maybe_record_history()
+        version = self._metrics_version
+        cached_version, body = self._metrics_json
+        if cached_version != version:
+            body = orjson.dumps(self.get_metrics(), option=orjson.OPT_SERIALIZE_NUMPY)
+            self._metrics_json = (version, body)
+        return body
+    
+    def _maybe_record_history(self):
+        """Record a history snapshot if history_interval has passed"""
+        now = time.time()
+        if now - self._last_snapshot >= self.history_interval:
+            self._last_snapshot = now
+            self._record_history(now)
+    
+    def _record_history(self, timestamp: float):
+        """Write one snapshot into the history ring buffer"""
+        metrics = self.current_metrics
+        self.metrics_history[self._history_index] = (
+            timestamp,
+            _clamp_int64(self.counters['total_writes']),
+            _clamp_int64(self.counters['failed_writes']),
+            _clamp_int64(self.counters['messages_processed']),
+            metrics.bigtable_write_latency_ms,
+            metrics.bigtable_error_rate,
+            _clamp_int64(metrics.buffer_queue_depth),
+            metrics.buffer_lag_seconds
+        )
+        self._history_index = (self._history_index + 1) % self.window_size
+        self._history_count = min(self._history_count + 1, self.window_size)
+        self._metrics_changed()
     
     def _add_alert(self, level: str, message: str):
         """Add an alert to the queue"""
@@ -139,37 +360,14 @@ class FirehoseMonitor:
             'message': message
         }
         self.alerts.append(alert)
+        self._metrics_changed()
         logger.warning(f"Firehose Alert [{level}]: {message}")
     
-    def _monitor_loop(self):
-        """Background monitoring loop"""
-        while self.running:
-            try:
-                # Calculate derived metrics
-                if self.counters['total_batches'] > 0:
-                    self.current_metrics.batch_efficiency = (
-                        self.counters['messages_processed'] / 
-                        (self.counters['total_batches'] * 5000)  # Assuming 5000 batch size
-                    )
-                
-                # Store snapshot
-                snapshot = {
-                    'timestamp': time.time(),
-                    'metrics': asdict(self.current_metrics),
-                    'counters': self.counters.copy()
-                }
-                self.metrics_history.append(snapshot)
-                
-                # Sleep
-                time.sleep(5)
-                
-            except Exception as e:
-                logger.error(f"Monitor loop error: {e}")
-    
     def get_metrics(self) -> Dict:
         """Get current metrics as dictionary"""
+        self._maybe_record_history()
         return {
-            'firehose': asdict(self.current_metrics),
+            'firehose': self._metrics_dict(),
             'counters': self.counters,
             'alerts': list(self.alerts)[-10:],  # Last 10 alerts
             'history': self._get_history_summary()
@@ -177,31 +375,37 @@ class FirehoseMonitor:
     
     def _get_history_summary(self) -> Dict:
         """Get summary of historical metrics"""
-        if not self.metrics_history:
+        if not self._history_count:
             return {}
         
+        # Reuse the last summary until a snapshot or batch changes its inputs
+        key = (self._last_snapshot, self.counters['messages_processed'],
+               self.counters['failed_writes'])
+        cached_key, summary = self._history_summary
+        if cached_key == key:
+            return summary
+        
         # Calculate averages over window
-        total_writes = sum(h['counters']['total_writes'] for h in self.metrics_history)
-        time_span = self.metrics_history[-1]['timestamp'] - self.metrics_history[0]['timestamp']
+        history = self.metrics_history
+        total_writes = float(history['total_writes'][:self._history_count].sum())
+        timestamps = history['timestamp']
+        oldest = self._history_index if self._history_count == self.window_size else 0
+        time_span = float(timestamps[self._history_index - 1] - timestamps[oldest])
         
         if time_span > 0:
             avg_writes_per_sec = total_writes / time_span
         else:
             avg_writes_per_sec = 0
         
-        return {
+        summary = {
             'avg_writes_per_second': avg_writes_per_sec,
             'total_messages_processed': self.counters['messages_processed'],
-            'success_rate': 1 - (self.counters['failed_writes'] / 
-                                max(1, self.counters['messages_processed'])),
+            'success_rate': float(1.0 - np.divide(self.counters['failed_writes'],
+                                                  max(1, self.counters['messages_processed']))),
             'time_span_seconds': time_span
         }
-    
-    def stop(self):
-        """Stop the monitor"""
-        self.running = False
-        if self.monitor_thread.is_alive():
-            self.monitor_thread.join(timeout=5)
+        self._history_summary = (key, summary)
+        return summary
 
 
 # Flask Blueprint for API endpoints
@@ -224,46 +428,58 @@ def init_firehose_monitor():
 def get_firehose_metrics():
     """Get firehose pipeline metrics"""
     if firehose_monitor:
-        return jsonify(firehose_monitor.get_metrics())
+        return Response(firehose_monitor.get_metrics_json(), mimetype='application/json')
     return jsonify({'error': 'Monitor not initialized'}), 500
 
 
+def _is_number(value) -> bool:
+    """Whether value is a number within MAX_REPORTED_VALUE (NaN never is)"""
+    return (isinstance(value, (int, float)) and not isinstance(value, bool)
+            and abs(value) <= MAX_REPORTED_VALUE)
+
+
+def _clamp_int64(value) -> int:
+    """value as an int within the int64 range of the history columns"""
+    return max(-INT64_MAX - 1, min(int(value), INT64_MAX))
+
+
+def _update_error(data) -> Optional[str]:
+    """Why a worker report cannot be applied, or None if it is valid"""
+    if not isinstance(data, dict):
+        return 'Expected a JSON object of metric sections'
+    for section, fields in UPDATE_NUMERIC_FIELDS.items():
+        if section not in data:
+            continue
+        values = data[section]
+        if not isinstance(values, dict):
+            return f'{section} must be an object'
+        for field in fields:
+            if field in values and not _is_number(values[field]):
+                return f'{section}.{field} must be a number no larger than {MAX_REPORTED_VALUE}'
+    shard_stats = data.get('bigtable', {}).get('shard_stats', {})
+    if not isinstance(shard_stats, dict):
+        return 'bigtable.shard_stats must be an object'
+    if not isinstance(data.get('batch', {}).get('success', True), bool):
+        return 'batch.success must be a boolean'
+    shards = data.get('shards', {})
+    if not isinstance(shards, dict) or not all(_is_number(v) for v in shards.values()):
+        return 'shards must map tablet start keys to row counts'
+    return None
+
+
 @firehose_bp.route('/api/firehose/update', methods=['POST'])
 def update_firehose_metrics():
     """Update firehose metrics from workers"""
     try:
         data = request.json
+        error = _update_error(data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        if 'bigtable' in data:
-            firehose_monitor.update_bigtable_metrics(
-                writes_per_sec=data['bigtable'].get('writes_per_second', 0),
-                latency_ms=data['bigtable'].get('latency_ms', 0),
-                error_rate=data['bigtable'].get('error_rate', 0),
-                shard_stats=data['bigtable'].get('shard_stats', {})
-            )
+        # Applied in batches by the monitor's ingress thread
+        firehose_monitor.enqueue_update(data)
         
-        if 'buffer' in data:
-            firehose_monitor.update_buffer_metrics(
-                queue_depth=data['buffer'].get('queue_depth', 0),
-                lag_seconds=data['buffer'].get('lag_seconds', 0),
-                messages_buffered=data['buffer'].get('messages_buffered', 0)
-            )
-        
-        if 'workers' in data:
-            firehose_monitor.update_worker_metrics(
-                pool_size=data['workers'].get('pool_size', 0),
-                utilization=data['workers'].get('utilization', 0),
-                batch_efficiency=data['workers'].get('batch_efficiency', 0)
-            )
-        
-        if 'batch' in data:
-            firehose_monitor.record_batch(
-                batch_size=data['batch'].get('size', 0),
-                success=data['batch'].get('success', True),
-                retry_count=data['batch'].get('retries', 0)
-            )
-        
-        return jsonify({'status': 'success'})
+        return jsonify({'status': 'accepted'}), 202
         
     except Exception as e:
         logger.error(f"Error updating firehose metrics: {e}")
@@ -541,10 +757,33 @@ FIREHOSE_DASHBOARD = """
 """
 
 
+# The dashboard has no template variables, so its bytes, gzip copy and
+# ETags are computed once
+DASHBOARD_BYTES = FIREHOSE_DASHBOARD.encode('utf-8')
+DASHBOARD_GZIP = gzip.compress(DASHBOARD_BYTES, 9)
+DASHBOARD_ETAG = hashlib.blake2s(DASHBOARD_BYTES).hexdigest()
+DASHBOARD_GZIP_ETAG = f"{DASHBOARD_ETAG}-gz"
+
+
 @firehose_bp.route('/firehose')
 def firehose_dashboard():
     """Serve the firehose dashboard"""
-    return render_template_string(FIREHOSE_DASHBOARD)
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        body, etag = DASHBOARD_GZIP, DASHBOARD_GZIP_ETAG
+    else:
+        body, etag = DASHBOARD_BYTES, DASHBOARD_ETAG
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='text/html')
+        if body is DASHBOARD_GZIP:
+            response.headers['Content-Encoding'] = 'gzip'
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 
 # Integration function for main app
@@ -1,17 +1,26 @@
 #!/usr/bin/env python
 import os
-import sys
-import subprocess
 
 port = os.environ.get('PORT', '5000')
+# Socket.IO's threading mode holds a thread for each open WebSocket or
+# long-poll, so leave plenty for /api/hashrate beyond the dashboard clients
+threads = os.environ.get('GUNICORN_THREADS', '100')
+
+# One worker: HashrateStore and Socket.IO sessions live in process memory.
+# Its threads keep a blocking Bigtable call from stalling other requests.
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'threading')
+
 cmd = [
     'gunicorn',
-    '--worker-class', 'eventlet',
+    '--worker-class', 'gthread',
     '-w', '1',
+    '--threads', threads,
     '--bind', f'0.0.0.0:{port}',
     '--timeout', '120',  # Increase timeout to 120 seconds
     '--graceful-timeout', '30',
+    '--worker-tmp-dir', '/dev/shm',  # Heartbeat file off disk
     'app:app'
 ]
 
-subprocess.run(cmd)
\ No newline at end of file
+# Replace this process so gunicorn receives signals directly
+os.execvp('gunicorn', cmd)
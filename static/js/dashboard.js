@@ -249,11 +249,13 @@ socket.on('initial_data', (data) => {
     updateHashrateChart(data.stats.total_hashrate);
 });
 
-socket.on('hashrate_update', (data) => {
+socket.on('hashrate_batch', (data) => {
     console.log('Hashrate update:', data);
     
-    // Update instance
-    instances[data.instance.instance_id] = data.instance;
+    // Update instances
+    data.instances.forEach(inst => {
+        instances[inst.instance_id] = inst;
+    });
     
     // Remove inactive instances (not seen in 30 seconds)
     const cutoff = Date.now() / 1000 - 30;
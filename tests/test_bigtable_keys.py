@@ -0,0 +1,109 @@
+import re
+import unittest
+from datetime import datetime, timedelta
+
+from google.cloud.bigtable.row_data import Cell, PartialRowData
+
+import bigtable_db as B
+
+
+def _in_row_set(row_set, key):
+    """Whether any range of row_set covers key"""
+    for row_range in row_set.row_ranges:
+        start, end = row_range.start_key, row_range.end_key
+        after_start = key >= start if row_range.start_inclusive else key > start
+        before_end = key <= end if row_range.end_inclusive else key < end
+        if after_start and before_end:
+            return True
+    return False
+
+
+def _row(key, cells=None):
+    row = PartialRowData(key)
+    for (family, column), value in (cells or {}).items():
+        row._cells.setdefault(family, {})[column] = [Cell(value, 0)]
+    return row
+
+
+def _micros(dt):
+    return B._epoch_micros(dt.isoformat())
+
+
+class RowKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.cutoff = datetime(2026, 1, 8, 12, 0, 0)
+        self.fresh = self.cutoff + timedelta(hours=1)
+        self.stale = self.cutoff - timedelta(days=1)
+
+    def test_key_instance_id_formats(self):
+        key = B._row_key('node-1', _micros(self.fresh)).encode('utf-8')
+        self.assertEqual(B._key_instance_id(key), 'node-1')
+        key = B._unsharded_row_key('node-1', _micros(self.fresh)).encode('utf-8')
+        self.assertEqual(B._key_instance_id(key), 'node-1')
+        self.assertEqual(B._key_instance_id(b'node-1#2026-01-08T12:00:00'), 'node-1')
+        # Unsharded keys of IDs containing '#' keep the whole ID
+        key = B._unsharded_row_key('a#b', _micros(self.fresh)).encode('utf-8')
+        self.assertEqual(B._key_instance_id(key), 'a#b')
+
+    def test_sharded_ranges_split_at_cutoff(self):
+        fresh = B._row_key('node-1', _micros(self.fresh)).encode('utf-8')
+        stale = B._row_key('node-1', _micros(self.stale)).encode('utf-8')
+        live = B._live_row_set('node-1', self.cutoff)
+        expired = B._expired_row_set('node-1', self.cutoff)
+        self.assertTrue(_in_row_set(live, fresh))
+        self.assertFalse(_in_row_set(expired, fresh))
+        self.assertTrue(_in_row_set(expired, stale))
+        self.assertFalse(_in_row_set(live, stale))
+
+    def test_unsharded_ranges_split_at_cutoff(self):
+        fresh = B._unsharded_row_key('node-1', _micros(self.fresh)).encode('utf-8')
+        stale = B._unsharded_row_key('node-1', _micros(self.stale)).encode('utf-8')
+        live = B._live_row_set('node-1', self.cutoff)
+        expired = B._expired_row_set('node-1', self.cutoff)
+        self.assertTrue(_in_row_set(live, fresh))
+        self.assertFalse(_in_row_set(expired, fresh))
+        self.assertTrue(_in_row_set(expired, stale))
+        self.assertFalse(_in_row_set(live, stale))
+
+    def test_legacy_ranges_split_at_cutoff(self):
+        fresh = f"node-1#{self.fresh.isoformat()}".encode('utf-8')
+        stale = f"node-1#{self.stale.isoformat()}".encode('utf-8')
+        live = B._live_row_set('node-1', self.cutoff)
+        expired = B._expired_row_set('node-1', self.cutoff)
+        self.assertTrue(_in_row_set(live, fresh))
+        self.assertFalse(_in_row_set(expired, fresh))
+        self.assertTrue(_in_row_set(expired, stale))
+
+    def test_hex_instance_id_ranges_skip_other_instances(self):
+        # A 4 hex digit ID's legacy ranges cover the sharded rows of every
+        # instance in the shard of the same name
+        shard = B._shard('1node')
+        other = B._row_key('1node', _micros(self.fresh)).encode('utf-8')
+        self.assertTrue(_in_row_set(B._expired_row_set(shard, self.cutoff), other))
+        self.assertEqual(list(B._owned_rows([_row(other)], shard)), [])
+        key_regex = B._instance_key_filter(shard).regex.decode('utf-8')
+        self.assertIsNone(re.fullmatch(key_regex, other.decode('utf-8')))
+
+        own = [
+            B._row_key(shard, _micros(self.stale)).encode('utf-8'),
+            B._unsharded_row_key(shard, _micros(self.stale)).encode('utf-8'),
+            f"{shard}#{self.stale.isoformat()}".encode('utf-8'),
+        ]
+        rows = [_row(key) for key in own]
+        self.assertEqual(list(B._owned_rows(rows, shard)), rows)
+        for key in own:
+            self.assertIsNotNone(re.fullmatch(key_regex, key.decode('utf-8')))
+
+    def test_idx_instance_rows_are_not_index_rows(self):
+        legacy = _row(f"idx#{self.stale.isoformat()}".encode('utf-8'),
+                      {('instance', b'id'): b'idx'})
+        index = _row(b'idx#1node', {('instance', b'id'): b'1node'})
+        self.assertIsNone(B._index_instance_id(legacy))
+        self.assertEqual(B._index_instance_id(index), '1node')
+        # The 'idx' instance's expired range covers index rows too
+        self.assertTrue(_in_row_set(B._expired_row_set('idx', self.cutoff), b'idx#1node'))
+        self.assertEqual(list(B._owned_rows([index, legacy], 'idx')), [legacy])
+
+
+if __name__ == '__main__':
+    unittest.main()